@@ -0,0 +1,42 @@
+from drf_base64.fields import Base64ImageField
+from rest_framework import serializers
+
+from foodgram.settings import (
+    RECIPE_IMAGE_MAX_BYTES, RECIPE_IMAGE_MAX_DIMENSION
+)
+
+
+class RecipeImageField(Base64ImageField):
+    '''Изображение рецепта в base64 с проверкой размера до декодирования'''
+    default_error_messages = {
+        'too_large': (
+            f'Размер изображения не должен превышать '
+            f'{RECIPE_IMAGE_MAX_BYTES // (1024 * 1024)} МБ'
+        ),
+        'too_big': (
+            f'Ширина и высота изображения не должны превышать '
+            f'{RECIPE_IMAGE_MAX_DIMENSION} пикселей'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('data:'):
+            encoded_size = len(data) - data.find(',') - 1
+            if encoded_size * 3 // 4 > RECIPE_IMAGE_MAX_BYTES:
+                self.fail('too_large')
+        image = super().to_internal_value(data)
+        width, height = image.image.size
+        if max(width, height) > RECIPE_IMAGE_MAX_DIMENSION:
+            self.fail('too_big')
+        return image
+
+
+class ThumbnailImageField(serializers.ImageField):
+    '''Миниатюра рецепта, пока она не готова — исходное изображение'''
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance.thumbnail or instance.image
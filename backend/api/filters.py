@@ -1,15 +1,33 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Case, Exists, F, OuterRef, Q, When
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
 from django_filters import rest_framework
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Recipe, Tag
+from recipes.cache import get_catalogue, get_request_recipe_ids
+from recipes.models import (
+    Favorite, Recipe, RecipeTag, ShoppingCart, Tag
+)
+from foodgram.settings import (
+    INGREDIENT_SEARCH_INFIX_MIN_LENGTH, INGREDIENT_SEARCH_LIMIT
+)
+
+
+def get_tag_ids():
+    '''Соответствие слагов тегов их id из кеша справочника'''
+    return get_catalogue(Tag, 'slug_ids', lambda: dict(
+        Tag.objects.values_list('slug', 'id')
+    ))
 
 
 class RecipeFilter(rest_framework.FilterSet):
-    tags = rest_framework.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
-    )
+    '''Фильтры рецептов без JOIN и DISTINCT.
+
+    Теги проверяются EXISTS-подзапросом, избранное и корзина — по id из
+    кеша рецептов пользователя.
+    '''
+    tags = rest_framework.MultipleChoiceFilter(method='get_tags')
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='get_is_in_shopping_cart',
         label='shopping_cart'
@@ -18,21 +36,121 @@ class RecipeFilter(rest_framework.FilterSet):
         method='get_favorite',
         label='favorite',
     )
+    search = rest_framework.CharFilter(
+        method='get_search',
+        label='search'
+    )
+    min_calories = rest_framework.NumberFilter(
+        field_name='calories', lookup_expr='gte'
+    )
+    max_calories = rest_framework.NumberFilter(
+        field_name='calories', lookup_expr='lte'
+    )
+    min_cost = rest_framework.NumberFilter(
+        field_name='cost', lookup_expr='gte'
+    )
+    max_cost = rest_framework.NumberFilter(
+        field_name='cost', lookup_expr='lte'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited')
+        fields = (
+            'author', 'tags', 'is_in_shopping_cart', 'is_favorited', 'search',
+            'min_calories', 'max_calories', 'min_cost', 'max_cost',
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.filters['tags'].extra['choices'] = lambda: [
+            (slug, slug) for slug in self.tag_ids
+        ]
+
+    @cached_property
+    def tag_ids(self):
+        '''Слаги тегов один раз на запрос: без общего кеша они читаются
+        из базы, а проверка выбора обходит их для каждого значения'''
+        return get_tag_ids()
+
+    def filter_by_user(self, queryset, model):
+        return queryset.filter(
+            id__in=get_request_recipe_ids(self.request, model)
+        )
+
+    def get_tags(self, queryset, name, value):
+        tag_ids = self.tag_ids
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            tag_id__in=[tag_ids[slug] for slug in value if slug in tag_ids],
+            recipe=OuterRef('pk')
+        )))
 
     def get_favorite(self, queryset, name, value):
         if value:
-            return queryset.filter(favorite__user=self.request.user)
+            return self.filter_by_user(queryset, Favorite)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return self.filter_by_user(queryset, ShoppingCart)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        '''Полнотекстовый поиск по названию и описанию с ранжированием.
+
+        Используется поле search_vector с GIN-индексом, запрос разбирается
+        в синтаксисе веб-поиска для русского и английского языков.
+        '''
+        value = value.strip()
+        if not value:
+            return queryset
+        query = (
+            SearchQuery(value, config='russian', search_type='websearch')
+            | SearchQuery(value, config='english', search_type='websearch')
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
 
-class IngredientsFilter(SearchFilter):
+
+class IngredientsFilter(BaseFilterBackend):
+    '''Автодополнение ингредиентов по названию.
+
+    Сначала выбираются совпадения с начала названия: условие
+    LOWER(name) LIKE 'x%' обслуживается btree-индексом с text_pattern_ops.
+    Совпадения в середине названия (LIKE '%x%', триграммный GIN-индекс)
+    запрашиваются, только если первых меньше INGREDIENT_SEARCH_LIMIT, и
+    только для строк не короче INGREDIENT_SEARCH_INFIX_MIN_LENGTH: по
+    более коротким триграммный индекс не помогает. Индексы созданы
+    миграцией 0009_ingredient_name_search_indexes.
+    '''
     search_param = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        # Поиск только в списке: срез нельзя фильтровать в get_object()
+        if view.action != 'list':
+            return queryset
+        return self.search(
+            queryset, request.query_params.get(self.search_param, '')
+        )
+
+    def search(self, queryset, name):
+        name = name.strip()
+        if not name:
+            return queryset
+        name = name.lower()
+        queryset = queryset.annotate(
+            lower_name=Lower('name')
+        ).order_by('lower_name')
+        prefix = queryset.filter(lower_name__startswith=name)
+        if len(name) < INGREDIENT_SEARCH_INFIX_MIN_LENGTH:
+            return prefix[:INGREDIENT_SEARCH_LIMIT]
+        found = list(prefix.values_list('pk', flat=True)[
+            :INGREDIENT_SEARCH_LIMIT
+        ])
+        if len(found) == INGREDIENT_SEARCH_LIMIT:
+            return queryset.filter(pk__in=found)
+        return queryset.filter(
+            Q(pk__in=found) | Q(lower_name__contains=name)
+        ).order_by(
+            Case(When(pk__in=found, then=0), default=1), 'lower_name'
+        )[:INGREDIENT_SEARCH_LIMIT]
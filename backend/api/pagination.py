@@ -0,0 +1,56 @@
+from rest_framework import exceptions
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from foodgram.settings import MAX_RECIPES_LIMIT
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Выдача рецептов по курсору (pub_date, id) без COUNT и OFFSET'''
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = MAX_RECIPES_LIMIT
+    # Курсор строится по первому полю порядка. При повторах его значений
+    # (калорийность и стоимость рецептов без атрибутов равны 0) курсор
+    # добавляет смещение, то есть тот же OFFSET
+    cursor_fields = ('pub_date',)
+
+    def get_ordering(self, request, queryset, view):
+        '''Порядок из параметра ordering, а без него — (pub_date, id):
+        у OrderingFilter представления нет порядка по умолчанию'''
+        ordering = OrderingFilter().get_ordering(request, queryset, view)
+        if not ordering:
+            return self.ordering
+        if ordering[0].lstrip('-') not in self.cursor_fields:
+            raise exceptions.ValidationError({'ordering': [
+                'Выдача по курсору поддерживает только порядок по '
+                + ', '.join(self.cursor_fields)
+            ]})
+        return tuple(ordering)
+
+
+class RecipePagination(PageNumberPagination):
+    '''Постраничная выдача рецептов.
+
+    Если в запросе передан параметр cursor (в том числе пустой для первой
+    страницы), выдача переключается на RecipeCursorPagination.
+    '''
+    cursor_pagination_class = RecipeCursorPagination
+    page_size_query_param = 'limit'
+    max_page_size = MAX_RECIPES_LIMIT
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
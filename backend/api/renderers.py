@@ -0,0 +1,73 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+from foodgram.settings import SHOPPING_LIST_CHUNK_SIZE
+
+
+def chunked(lines, size=SHOPPING_LIST_CHUNK_SIZE):
+    '''Склейка строк в куски по size строк для потоковой отдачи'''
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class Echo:
+    '''Буфер для csv.writer, возвращающий записанную строку'''
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(renderers.BaseRenderer):
+    '''Список покупок в виде текстового файла'''
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n'
+        for ingredient in ingredients:
+            yield (
+                f'{ingredient["name"]}, {ingredient["amount"]}'
+                f'{ingredient["measurement_unit"]}\n'
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    '''Список покупок в формате CSV'''
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['amount'],
+                ingredient['measurement_unit']
+            ))
+
+
+class ShoppingListJSONRenderer(renderers.JSONRenderer):
+    '''Список покупок в формате JSON'''
+
+    def stream(self, ingredients):
+        yield '['
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ','
+        yield ']'
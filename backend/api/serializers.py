@@ -1,14 +1,19 @@
 from rest_framework import serializers
-from drf_base64.fields import Base64ImageField
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from django.core.validators import MinValueValidator
+from django.db import transaction
 import re
 
 from recipes.models import (
     Ingredient, Tag,
-    Recipe, RecipeIngredient,
+    Recipe, RecipeIngredient, Favorite, ShoppingCart, skip_recipe_signals
 )
+from recipes.cache import get_request_recipe_ids
+from recipes.images import discard_recipe_files, schedule_recipe_image
+from recipes.rollups import update_rollups
+from recipes.shopping_list import invalidate_shopping_lists
 from users.models import User
+from api.fields import RecipeImageField, ThumbnailImageField
 
 
 class CustomUserSerializer(UserSerializer):
@@ -20,6 +25,8 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
@@ -35,6 +42,8 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     '''Отображение рецептов на странице подписок'''
+    image = ThumbnailImageField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -42,7 +51,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(CustomUserSerializer):
     '''Отображение авторов, на которых подписан пользователь'''
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = serializers.SerializerMethodField()
 
     class Meta:
@@ -53,14 +62,15 @@ class SubscriptionSerializer(CustomUserSerializer):
             'recipes'
         )
 
-    def get_recipes_count(self, user):
-        '''Подсчет количества рецептов'''
-        return user.author_recipes.count()
-
     def get_recipes(self, author):
-        recipes = Recipe.objects.filter(author=author)
-        recipe_limit = self.context['request'].GET.get('recipes_limit')
-        recipes = recipes[:int(recipe_limit)] if recipe_limit else recipes
+        '''Последние рецепты автора с учетом recipes_limit'''
+        if hasattr(author, 'recent_recipes'):
+            recipes = author.recent_recipes
+        else:
+            recipes = author.author_recipes.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
         serializer = ShortRecipeSerializer(recipes, many=True)
         return serializer.data
 
@@ -117,7 +127,7 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart'
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
     text = serializers.CharField(source='description')
 
     class Meta:
@@ -125,21 +135,38 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'calories', 'cost',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
         '''Проверка наличия рецепта в избранном'''
-        curent_user = self.context['request'].user
-        if curent_user.is_anonymous:
-            return False
-        return curent_user.favorite.filter(recipe=obj).exists()
+        return obj.id in get_request_recipe_ids(
+            self.context['request'], Favorite
+        )
 
     def get_is_in_shopping_cart(self, obj):
         '''Проверка наличия рецепта в списке покупок'''
-        curent_user = self.context['request'].user
-        if curent_user.is_anonymous:
-            return False
-        return curent_user.shopping_cart.filter(recipe=obj).exists()
+        return obj.id in get_request_recipe_ids(
+            self.context['request'], ShoppingCart
+        )
+
+
+class RecipeListSerializer(ReadRecipeSerializer):
+    '''Список рецептов с миниатюрами изображений'''
+    image = ThumbnailImageField()
+
+
+class CookableRecipeSerializer(RecipeListSerializer):
+    '''Рецепт с долей ингредиентов, которые есть у пользователя'''
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(ReadRecipeSerializer.Meta):
+        fields = ReadRecipeSerializer.Meta.fields + ('coverage',)
 
 
 class CreateRecipeSerializer(ReadRecipeSerializer):
@@ -213,19 +240,85 @@ class CreateRecipeSerializer(ReadRecipeSerializer):
             new_ingredients.append(new_ingredient)
         return RecipeIngredient.objects.bulk_create(new_ingredients)
 
+    def update_ingredients(self, recipe, ingredients):
+        '''Изменение только отличающихся строк ингредиентов рецепта.
+
+        Строки меняются без сигналов: удаление — в skip_recipe_signals,
+        остальное — bulk-операциями. Возвращает, изменился ли состав.
+        '''
+        amounts = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {
+            row.ingredient_id: row
+            for row in recipe.recipe_ingredients.order_by()
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            with skip_recipe_signals((recipe.pk,)):
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed
+                ).delete()
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        added = [
+            {'ingredient': {'id': ingredient_id}, 'amount': amount}
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        if added:
+            self.create_ingredients(added, recipe)
+        return bool(removed or changed or added)
+
+    def get_saved(self, recipe):
+        '''Сохраненный рецепт для ответа: с пересчитанными калорийностью и
+        стоимостью, автором, тегами и ингредиентами без N+1 запросов'''
+        return Recipe.objects.with_related().get(pk=recipe.pk)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('recipe_ingredients')
         recipe = super().create(validated_data)
         self.create_ingredients(ingredients, recipe)
-        return recipe
+        # bulk_create не отправляет сигналов
+        update_rollups(pk=recipe.pk)
+        schedule_recipe_image(recipe)
+        return self.get_saved(recipe)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('recipe_ingredients')
-        instance = super().update(instance, validated_data)
-        if ingredients:
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
-        return instance
+        # Рецепт перечитывается под блокировкой: параллельные правки
+        # применяются по очереди, а UPDATE затрагивает только переданные
+        # поля и не откатывает чужие изменения и счетчики
+        instance = Recipe.objects.select_for_update().get(pk=instance.pk)
+        ingredients = validated_data.pop('recipe_ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if 'image' in validated_data:
+            # Миниатюра старого изображения сбрасывается в том же UPDATE,
+            # до ее пересоздания отдается новое изображение
+            discard_recipe_files(instance)
+            validated_data['thumbnail'] = ''
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if validated_data:
+            instance.save(update_fields=validated_data.keys())
+        if tags is not None:
+            instance.tags.set(tags)
+        if 'image' in validated_data:
+            schedule_recipe_image(instance)
+        if ingredients and self.update_ingredients(instance, ingredients):
+            # Один пересчет и сброс списков покупок с этим рецептом вместо
+            # сигналов по каждой строке
+            update_rollups(pk=instance.pk)
+            invalidate_shopping_lists((instance.pk,))
+        return self.get_saved(instance)
 
     def to_representation(self, instance):
         return ReadRecipeSerializer(
@@ -0,0 +1,303 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.serializers import CreateRecipeSerializer
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+from users.models import Subscription, User
+from foodgram.cache import is_cache_shared
+
+
+class APITestCase(TestCase):
+    '''Пользователи, теги, ингредиенты и клиенты API для тестов'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.breakfast = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.lunch = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    @classmethod
+    def create_recipe(cls, author, tags=(), name='Рецепт'):
+        recipe = Recipe.objects.create(
+            author=author, name=name, image='recipes/test.jpg',
+            description='Описание', cooking_time=10
+        )
+        recipe.tags.set(tags)
+        for ingredient in cls.ingredients:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+        return recipe
+
+
+class RecipeListQueriesTest(APITestCase):
+    '''Число запросов списка рецептов не зависит от размера страницы'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Subscription.objects.create(user=cls.user, author=cls.author)
+        for number in range(20):
+            recipe = cls.create_recipe(
+                cls.author, (cls.breakfast, cls.lunch), f'Рецепт {number}'
+            )
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def assert_list_queries(self, client, count):
+        for limit in (1, 20):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(count):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        # COUNT, страница, теги, ингредиенты
+        self.assert_list_queries(self.anonymous, 4)
+
+    def test_authenticated(self):
+        # токен, COUNT, страница, теги, ингредиенты, id рецептов
+        # в избранном и в списке покупок
+        self.assert_list_queries(self.client, 7)
+
+
+class RecipeUpdateTest(APITestCase):
+    '''Изменение рецепта не затирает чужие правки и счетчики'''
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.user, (self.breakfast,))
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def update(self, instance, data):
+        '''PATCH через сериализатор с ранее загруженной копией рецепта, как
+        у параллельного запроса'''
+        request = APIRequestFactory().patch(self.url)
+        request.user = self.user
+        serializer = CreateRecipeSerializer(
+            instance, data=data, partial=True,
+            context={'request': Request(request)}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_concurrent_patches_keep_fields(self):
+        first = Recipe.objects.get(pk=self.recipe.pk)
+        second = Recipe.objects.get(pk=self.recipe.pk)
+        self.update(first, {'name': 'Новое название'})
+        self.update(second, {'cooking_time': 42})
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.cooking_time, 42)
+
+    def test_patch_keeps_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        response = self.client.post(f'{self.url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.update(stale, {'cooking_time': 42})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_ingredients_diff(self):
+        rows = dict(self.recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'id'
+        ))
+        first, second, _ = self.ingredients
+        data = {'ingredients': [
+            {'id': first.pk, 'amount': 100},
+            {'id': second.pk, 'amount': 250},
+        ]}
+        # Число запросов не зависит от числа ингредиентов рецепта
+        with self.assertNumQueries(17):
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dict(self.recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'amount'
+        )), {first.pk: 100, second.pk: 250})
+        # Сохранившиеся строки не пересоздаются
+        self.assertEqual(dict(self.recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'id'
+        )), {first.pk: rows[first.pk], second.pk: rows[second.pk]})
+
+
+class RelationToggleTest(APITestCase):
+    '''Повторное добавление и удаление связей не меняет счетчики дважды'''
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.author)
+
+    def assert_toggle(self, url, counter):
+        obj, field = counter
+        for method, codes, value in (
+            ('post', (201, 400), 1),
+            ('delete', (204, 400), 0),
+        ):
+            for code in codes:
+                response = getattr(self.client, method)(url)
+                self.assertEqual(response.status_code, code)
+                obj.refresh_from_db()
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_favorite(self):
+        self.assert_toggle(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            (self.recipe, 'favorites_count')
+        )
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+    def test_subscribe(self):
+        self.assert_toggle(
+            f'/api/users/{self.author.pk}/subscribe/',
+            (self.author, 'followers_count')
+        )
+
+    def test_missing_object(self):
+        for url in (
+            '/api/recipes/0/favorite/', '/api/users/0/subscribe/'
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.post(url).status_code, 404)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_bulk_favorites(self):
+        other = self.create_recipe(self.author, name='Другой рецепт')
+        url = '/api/recipes/favorite/'
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        ids = [self.recipe.pk, other.pk, other.pk, other.pk + 1]
+        for method, statuses, count in (
+            ('post', ['exists', 'created', 'not_found'], 1),
+            ('post', ['exists', 'exists', 'not_found'], 1),
+            ('delete', ['deleted', 'deleted', 'not_found'], 0),
+            ('delete', ['absent', 'absent', 'not_found'], 0),
+        ):
+            response = getattr(self.client, method)(
+                url, {'ids': ids}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [result['status'] for result in response.data['results']],
+                statuses
+            )
+            for recipe in (self.recipe, other):
+                recipe.refresh_from_db()
+                self.assertEqual(recipe.favorites_count, count)
+
+    def test_bulk_subscribe(self):
+        url = '/api/users/subscribe/'
+        ids = [self.author.pk, self.author.pk, self.user.pk]
+        for method, statuses, count in (
+            ('post', ['created', 'not_found'], 1),
+            ('post', ['exists', 'not_found'], 1),
+            ('delete', ['deleted', 'absent'], 0),
+        ):
+            response = getattr(self.client, method)(
+                url, {'ids': ids}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [result['status'] for result in response.data['results']],
+                statuses
+            )
+            self.author.refresh_from_db()
+            self.assertEqual(self.author.followers_count, count)
+
+
+class RecipeFilterTest(APITestCase):
+    '''Сочетания фильтров списка рецептов'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.both = cls.create_recipe(cls.author, (cls.breakfast,))
+        cls.favorite = cls.create_recipe(cls.author, (cls.lunch,))
+        cls.cart = cls.create_recipe(cls.user, (cls.breakfast, cls.lunch))
+        cls.plain = cls.create_recipe(cls.author)
+        for recipe in (cls.both, cls.favorite):
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in (cls.both, cls.cart):
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def test_combinations(self):
+        author, user = self.author.pk, self.user.pk
+        cases = (
+            ('', {self.both, self.favorite, self.cart, self.plain}),
+            ('tags=breakfast', {self.both, self.cart}),
+            ('tags=breakfast&tags=lunch', {
+                self.both, self.favorite, self.cart
+            }),
+            ('is_favorited=1', {self.both, self.favorite}),
+            ('is_in_shopping_cart=1', {self.both, self.cart}),
+            ('is_favorited=1&is_in_shopping_cart=1', {self.both}),
+            (f'author={author}&tags=lunch&is_favorited=1', {self.favorite}),
+            (f'author={user}&tags=breakfast&is_in_shopping_cart=1', {
+                self.cart
+            }),
+            (
+                f'author={author}&tags=breakfast&tags=lunch&is_favorited=1'
+                '&is_in_shopping_cart=1',
+                {self.both}
+            ),
+            (f'author={user}&is_favorited=1', set()),
+        )
+        # Соответствие слагов тегов их id кешируется первым запросом
+        self.client.get('/api/recipes/?tags=breakfast')
+        for query, expected in cases:
+            with self.subTest(query=query):
+                # токен, COUNT, страница, теги, ингредиенты, id рецептов
+                # в избранном и в списке покупок; для пустого результата —
+                # только токен, id рецептов в избранном и COUNT. Автор из
+                # фильтра проверяется отдельным запросом, слаги тегов без
+                # общего кеша читаются из базы
+                queries = (
+                    (7 if expected else 3) + ('author=' in query)
+                    + ('tags=' in query and not is_cache_shared())
+                )
+                with self.assertNumQueries(queries):
+                    response = self.client.get(f'/api/recipes/?{query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    {recipe['id'] for recipe in response.data['results']},
+                    {recipe.pk for recipe in expected}
+                )
+                self.assertEqual(response.data['count'], len(expected))
+
+    def test_unknown_tag(self):
+        response = self.client.get('/api/recipes/?tags=unknown')
+        self.assertEqual(response.status_code, 400)
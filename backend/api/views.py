@@ -1,79 +1,185 @@
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework import (
-    viewsets, exceptions, status, permissions, generics
+    viewsets, exceptions, status, permissions, generics, serializers
 )
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (
+    BooleanField, OuterRef, Prefetch, Subquery, Value
+)
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 from api.serializers import (
     IngredientSerializer, TagSerializer,
-    ReadRecipeSerializer, CreateRecipeSerializer,
-    SubscriptionSerializer, ShortRecipeSerializer
+    ReadRecipeSerializer, CreateRecipeSerializer, RecipeListSerializer,
+    SubscriptionSerializer, ShortRecipeSerializer, CookableRecipeSerializer
 )
 from recipes.models import Tag, Ingredient, Recipe, Favorite, ShoppingCart
+from recipes.feed import get_feed
+from recipes.relations import add_relations, remove_relations
+from recipes.shopping_list import get_shopping_list
+from recipes.cache import (
+    get_catalogue, get_catalogue_etag, get_catalogue_last_modified
+)
 from api.permissions import IsAuthorOrAdminPermission
 from users.models import User, Subscription
 from api.filters import RecipeFilter, IngredientsFilter
+from api.pagination import RecipeCursorPagination, RecipePagination
+from api.renderers import (
+    ShoppingListTextRenderer, ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer, chunked
+)
+from foodgram.settings import (
+    BULK_MAX_ITEMS, COOKABLE_MAX_INGREDIENTS, MAX_RECIPES_LIMIT
+)
+
+
+def catalogue_condition(model):
+    '''Поддержка ETag и Last-Modified по версии справочника'''
+    return method_decorator(condition(
+        etag_func=lambda request, *args, **kwargs: get_catalogue_etag(model),
+        last_modified_func=lambda request, *args, **kwargs: (
+            get_catalogue_last_modified(model)
+        )
+    ), name='dispatch')
+
+
+def validate_ids(name, values, max_length):
+    '''Проверка списка id, ошибки относятся к параметру name'''
+    try:
+        return serializers.ListField(
+            child=serializers.IntegerField(min_value=1),
+            min_length=1,
+            max_length=max_length
+        ).run_validation(values)
+    except exceptions.ValidationError as error:
+        raise exceptions.ValidationError({name: error.detail})
+
+
+def bulk_relations(request, model, targets):
+    '''Массовое добавление (POST) или удаление (DELETE) связей
+    пользователя с объектами из targets по списку {"ids": [...]}.
+
+    Связи создаются одним INSERT ... ON CONFLICT DO NOTHING или удаляются
+    одним DELETE, существование объектов проверяется отдельным запросом
+    только для id, связь с которыми не изменилась. В ответе — результат для
+    каждого id: created или exists, deleted или absent, not_found для
+    несуществующих объектов.
+    '''
+    ids = validate_ids('ids', (
+        request.data.get('ids') if isinstance(request.data, dict) else None
+    ), BULK_MAX_ITEMS)
+    if request.method == 'POST':
+        changed = add_relations(
+            model, request.user, targets.filter(pk__in=ids)
+        )
+        statuses = ('created', 'exists')
+    else:
+        changed = remove_relations(model, request.user, ids)
+        statuses = ('deleted', 'absent')
+    rest = set(ids) - changed
+    found = changed | set(
+        targets.filter(pk__in=rest).values_list('pk', flat=True)
+    ) if rest else changed
+    return Response({'results': [
+        {
+            'id': pk,
+            'status': (
+                'not_found' if pk not in found
+                else statuses[0] if pk in changed else statuses[1]
+            ),
+        }
+        for pk in dict.fromkeys(ids)
+    ]})
+
+
+class CatalogueViewSet(viewsets.ReadOnlyModelViewSet):
+    '''Справочник, список которого отдается из кеша'''
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(get_catalogue(
+            self.queryset.model,
+            request.get_full_path(),
+            lambda: list(self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True
+            ).data)
+        ))
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+@catalogue_condition(Tag)
+class TagViewSet(CatalogueViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+@catalogue_condition(Ingredient)
+class IngredientViewSet(CatalogueViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientsFilter,)
-    search_fields = ('^name',)
-    pagination_class = None
 
 
 class RecipesViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     serializer_class = CreateRecipeSerializer
     permission_classes = (IsAuthorOrAdminPermission,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'calories', 'cost')
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve', 'cookable', 'feed']:
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return super().get_queryset()
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action == 'list':
+            return RecipeListSerializer
+        if self.action == 'retrieve':
             return ReadRecipeSerializer
         return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def toggle_relation(self, request, pk, model, messages):
+        '''Добавление (POST) или удаление (DELETE) рецепта одним
+        INSERT ... ON CONFLICT DO NOTHING / DELETE ... RETURNING: повторный
+        запрос получает ошибку 400, а не нарушение уникальности'''
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not add_relations(
+                model, request.user, Recipe.objects.filter(pk=recipe.pk)
+            ):
+                raise exceptions.ValidationError(messages[0])
+            serializer = self.get_serializer(recipe)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        if not remove_relations(model, request.user, [int(pk)]):
+            get_object_or_404(Recipe, pk=pk)
+            raise exceptions.ValidationError(messages[1])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         methods=('post', 'delete'),
         detail=True,
         serializer_class=ShortRecipeSerializer
     )
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        user = request.user
-        favorite = recipe.favorite.filter(
-            user=user
-        ).exists()
-
-        if request.method == 'POST':
-            if favorite:
-                raise exceptions.ValidationError('Рецепт уже в избранном')
-            favorite = Favorite.objects.create(user=user, recipe=recipe)
-            serializer = self.get_serializer(favorite.recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        if not favorite:
-            raise exceptions.ValidationError(
-                'Рецепт не находится в избранном'
-            )
-        get_object_or_404(Favorite, user=user, recipe=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.toggle_relation(request, pk, Favorite, (
+            'Рецепт уже в избранном',
+            'Рецепт не находится в избранном',
+        ))
 
     @action(
         methods=('post', 'delete'),
@@ -81,100 +187,178 @@ class RecipesViewSet(viewsets.ModelViewSet):
         serializer_class=ShortRecipeSerializer
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        user = request.user
-        in_shopping_cart = recipe.shopping_cart.filter(user=user)
+        return self.toggle_relation(request, pk, ShoppingCart, (
+            'Рецепт уже в списке покупок',
+            'Рецепт не находится в списке покупок',
+        ))
 
-        if request.method == 'POST':
-            if in_shopping_cart:
-                raise exceptions.ValidationError('Рецепт уже в списке покупок')
-            add_to_cart = ShoppingCart.objects.create(
-                user=user, recipe=recipe
-            )
-            serializer = self.get_serializer(add_to_cart.recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        if not in_shopping_cart:
-            raise exceptions.ValidationError(
-                'Рецепт не находится в списке покупок'
-            )
-        get_object_or_404(ShoppingCart, user=user, recipe=recipe).delete()
+    @action(
+        methods=('post', 'delete'),
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return bulk_relations(request, Favorite, Recipe.objects.all())
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        methods=('post', 'delete'),
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return bulk_relations(request, ShoppingCart, Recipe.objects.all())
 
     @action(
         methods=('get',),
         detail=False,
-        permission_classes=(IsAuthorOrAdminPermission,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        )
     )
     def download_shopping_cart(self, request):
-        ingredients = Ingredient.objects.filter(
-            ingredient_recipes__recipe__shopping_cart__user=request.user
-        ).values(
-            'name', 'measurement_unit'
-        ).annotate(
-            amount=Sum('ingredient_recipes__amount')
-        )
+        ingredients = get_shopping_list(request.user.pk)
 
-        text = 'Список покупок:\n'
-        for ingredient in ingredients:
-            text += (
-                f'{ingredient["name"]}, {ingredient["amount"]}'
-                f'{ingredient["measurement_unit"]}\n'
-            )
-
-        response = HttpResponse(text, content_type='text/plain')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            chunked(renderer.stream(ingredients)),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-cart.txt'
+            f'attachment; filename=shopping-cart.{renderer.format}'
         )
         return response
 
+    def get_ingredient_ids(self):
+        '''id из ?ingredients=1&ingredients=2 или ?ingredients=1,2'''
+        return set(validate_ids('ingredients', [
+            value
+            for param in self.request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ], COOKABLE_MAX_INGREDIENTS))
 
-class SubscribtionsView(generics.ListAPIView):
-    queryset = User.objects.all()
+    @action(
+        methods=('get',),
+        detail=False,
+        serializer_class=CookableRecipeSerializer
+    )
+    def cookable(self, request):
+        '''Рецепты из имеющихся ингредиентов, по убыванию их доли'''
+        queryset = self.filter_queryset(self.get_queryset()).cookable(
+            self.get_ingredient_ids()
+        ).order_by('-coverage', '-matched', '-pub_date', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('get',),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=RecipeCursorPagination,
+        serializer_class=RecipeListSerializer
+    )
+    def feed(self, request):
+        '''Новые рецепты авторов, на которых подписан пользователь'''
+        queryset = get_feed(
+            self.filter_queryset(self.get_queryset()), request.user.pk
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class RecipesLimitMixin:
+    '''Проверка параметра recipes_limit для страниц подписок'''
+
+    def get_recipes_limit(self):
+        value = self.request.query_params.get('recipes_limit')
+        if value is None:
+            return None
+        try:
+            return serializers.IntegerField(
+                min_value=1, max_value=MAX_RECIPES_LIMIT
+            ).run_validation(value)
+        except exceptions.ValidationError as error:
+            raise exceptions.ValidationError({'recipes_limit': error.detail})
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
+
+class SubscribtionsView(RecipesLimitMixin, generics.ListAPIView):
     serializer_class = SubscriptionSerializer
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = PageNumberPagination
 
-    def get(self, request):
-        authors = User.objects.filter(author_subscription__user=request.user)
-        paginate_authors = self.paginate_queryset(authors)
-        serializer = self.get_serializer(paginate_authors, many=True)
-        return self.get_paginated_response(serializer.data)
+    def get_queryset(self):
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'thumbnail', 'cooking_time', 'author_id'
+        )
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return User.objects.filter(
+            author_subscription__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch('author_recipes', queryset=recipes,
+                     to_attr='recent_recipes')
+        )
 
 
-class SubscribtionsCreateDeleteView(generics.RetrieveDestroyAPIView):
+class SubscribtionsCreateDeleteView(RecipesLimitMixin,
+                                    generics.RetrieveDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = SubscriptionSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def delete(self, request, pk):
-        author = get_object_or_404(User, pk=pk)
-        follover = request.user
-        subscription = follover.user_subscription.filter(
-            author=author
-        ).exists()
-        if not subscription:
+        if not remove_relations(Subscription, request.user, [pk]):
+            get_object_or_404(User, pk=pk)
             raise exceptions.ValidationError(
                 'Вы не подписаны на этого автора'
             )
-        get_object_or_404(
-            Subscription,
-            user=follover,
-            author=author
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def post(self, request, pk):
         author = get_object_or_404(User, pk=pk)
-        follover = request.user
-        subscription = follover.user_subscription.filter(
-            author=author
-        ).exists()
-        if subscription:
+        if author == request.user:
+            raise exceptions.ValidationError(
+                'Нельзя подписаться на самого себя'
+            )
+        if not add_relations(
+            Subscription, request.user, User.objects.filter(pk=author.pk)
+        ):
             raise exceptions.ValidationError(
                 'Вы уже подписаны на этого автора'
             )
-        Subscription.objects.create(user=follover, author=author)
+        author.is_subscribed = True
         serializer = self.get_serializer(author)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class SubscribtionsBulkView(generics.GenericAPIView):
+    '''Подписка на список авторов и отписка от них'''
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        return bulk_relations(
+            request, Subscription, User.objects.exclude(pk=request.user.pk)
+        )
+
+    def delete(self, request):
+        return bulk_relations(request, Subscription, User.objects.all())
@@ -0,0 +1,167 @@
+'''Замер времени ленты подписок на синтетических данных.
+
+Данные создаются в транзакции, которая в конце откатывается. Запуск из
+каталога backend: python benchmarks/feed.py --authors 10000
+'''
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from recipes.cache import pack_ids, unpack_ids  # noqa: E402
+from recipes.feed import build_timeline, get_timeline_key  # noqa: E402
+from recipes.models import Recipe  # noqa: E402
+from users.models import Subscription, User  # noqa: E402
+from foodgram.settings import (  # noqa: E402
+    FEED_TIMELINE_CACHE_TIMEOUT, REST_FRAMEWORK
+)
+
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def create_data(authors_count, recipes_count):
+    '''Читатель, подписанный на authors_count авторов с рецептами'''
+    reader = User.objects.create(
+        username='feed-benchmark', email='feed-benchmark@example.com'
+    )
+    User.objects.bulk_create((
+        User(
+            username=f'feed-benchmark-{number}',
+            email=f'feed-benchmark-{number}@example.com'
+        )
+        for number in range(authors_count)
+    ), batch_size=DEFAULT_BATCH_SIZE)
+    # bulk_create заполняет id только в PostgreSQL
+    authors = list(User.objects.filter(
+        username__startswith='feed-benchmark-'
+    ).only('id'))
+    Subscription.objects.bulk_create((
+        Subscription(user=reader, author=author) for author in authors
+    ), batch_size=DEFAULT_BATCH_SIZE)
+    Recipe.objects.bulk_create((
+        Recipe(
+            author=author, name=f'Рецепт {number}',
+            image='recipes/feed-benchmark.jpg',
+            description='Рецепт для замера ленты', cooking_time=10
+        )
+        for author in authors for number in range(recipes_count)
+    ), batch_size=DEFAULT_BATCH_SIZE)
+    recipes = list(Recipe.objects.for_subscriber(reader.pk).only(
+        'id', 'author_id'
+    ).order_by('author_id', 'id'))
+    # Рецепты авторов чередуются во времени. bulk_update не вызывает
+    # pre_save и не перезаписывает auto_now_add
+    now = timezone.now()
+    for number, recipe in enumerate(recipes):
+        author_number, recipe_number = divmod(number, recipes_count)
+        recipe.pub_date = now - timedelta(
+            minutes=recipe_number * authors_count + author_number
+        )
+    Recipe.objects.bulk_update(
+        recipes, ('pub_date',), batch_size=DEFAULT_BATCH_SIZE
+    )
+    return reader
+
+
+def measure(name, repeat, func):
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    logging.info(
+        f'{name}: медиана {statistics.median(timings):.1f} мс, '
+        f'максимум {timings[-1]:.1f} мс, '
+        f'запросов {len(queries.captured_queries)}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--authors', type=int, default=10000,
+        help='Количество авторов в подписках'
+    )
+    parser.add_argument(
+        '--recipes', type=int, default=5,
+        help='Количество рецептов у каждого автора'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=20,
+        help='Количество замеров каждого варианта'
+    )
+    options = parser.parse_args()
+    authors_count = options.authors
+    recipes_count = options.recipes
+    repeat = options.repeat
+    if min(authors_count, recipes_count, repeat) < 1:
+        parser.error('Параметры должны быть больше нуля')
+    page_size = REST_FRAMEWORK['PAGE_SIZE']
+
+    with transaction.atomic():
+        logging.info(
+            f'Создание данных: авторов {authors_count}, '
+            f'рецептов {authors_count * recipes_count}'
+        )
+        reader = create_data(authors_count, recipes_count)
+        key = get_timeline_key(reader.pk)
+        queryset = Recipe.objects.with_related().order_by(
+            '-pub_date', '-id'
+        )
+        middle = Recipe.objects.for_subscriber(reader.pk).order_by(
+            '-pub_date'
+        ).values_list('pub_date', flat=True)[
+            authors_count * recipes_count // 2
+        ]
+
+        measure('Запрос через подписки', repeat, lambda: list(
+            queryset.for_subscriber(reader.pk)[:page_size]
+        ))
+        measure(
+            'Запрос через подписки, середина ленты', repeat,
+            lambda: list(queryset.for_subscriber(reader.pk).filter(
+                pub_date__lt=middle
+            )[:page_size])
+        )
+        measure(
+            'Сборка закешированной ленты', repeat,
+            lambda: build_timeline(reader.pk)
+        )
+        # get_feed читает ленту из кеша только с общим бэкендом кеша,
+        # поэтому лента кладется в кеш и читается здесь напрямую
+        cache.set(
+            key, pack_ids(build_timeline(reader.pk)),
+            FEED_TIMELINE_CACHE_TIMEOUT
+        )
+        try:
+            measure('Закешированная лента', repeat, lambda: list(
+                queryset.filter(pk__in=unpack_ids(cache.get(key)))[
+                    :page_size
+                ]
+            ))
+        finally:
+            cache.delete(key)
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
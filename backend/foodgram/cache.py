@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+# Бэкенды, данные которых видны только одному процессу или серверу
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+
+def is_cache_shared(alias='default'):
+    '''Общий ли кеш для всех процессов: воркеров gunicorn, контейнера
+    worker и management-команд'''
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
@@ -0,0 +1,13 @@
+from django.db import connections
+
+
+def close_unusable_connections():
+    """Закрыть постоянные соединения, которые перестали отвечать.
+
+    Аналог CONN_HEALTH_CHECKS из Django 4.1: соединение, оборванное
+    сервером или пулером, закрывается до начала работы с ним, и Django
+    откроет новое при первом запросе к базе.
+    """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,41 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_PREFIX = 'replica'
+
+# Реплика, выбранная ReplicaRoutingMiddleware на время обработки запроса:
+# все чтения запроса идут с одной реплики с одним отставанием
+use_replica = ContextVar('use_replica', default=None)
+
+
+def get_replicas():
+    return [
+        alias for alias in settings.DATABASES
+        if alias.startswith(REPLICA_PREFIX)
+    ]
+
+
+class ReplicaRouter:
+    """Чтение в безопасных запросах к API — с реплик, остальное — с primary.
+
+    Реплики — базы с псевдонимами replica* в DATABASES. Вне запроса
+    (команды, воркер очереди) и для записи всегда используется default.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Связанные объекты читаются из той же базы, что и исходный
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return use_replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+
+from foodgram.cache import is_cache_shared
+from foodgram.db import close_unusable_connections
+from foodgram.db_router import get_replicas, use_replica
+
+
+logger = logging.getLogger('foodgram.performance')
+
+
+class QueryBudgetExceededError(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено"""
+
+
+class QueryCounter:
+    """Обертка connection.execute_wrapper для подсчета запросов и времени"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class PerformanceMiddleware:
+    """Замер количества запросов к БД, времени ответа и его размера.
+
+    Результаты отдаются в заголовке Server-Timing и пишутся в лог
+    foodgram.performance. Для представлений из QUERY_BUDGETS проверяется
+    лимит запросов (ключ 'view_name' действует для GET и HEAD, ключ
+    'METHOD view_name' — для указанного метода): при превышении пишется
+    предупреждение, а при QUERY_BUDGET_RAISE = True выбрасывается
+    QueryBudgetExceededError.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request.render_started = request.render_finished = None
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        render = 0.0
+        if request.render_started and request.render_finished:
+            render = request.render_finished - request.render_started
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={counter.duration * 1000:.1f};'
+            f'desc="{counter.count} queries"',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+        view = self.get_view_name(request)
+        logger.info(
+            'method=%s path=%s view=%s status=%s queries=%d db_ms=%.1f '
+            'render_ms=%.1f total_ms=%.1f size=%s',
+            request.method, request.path, view, response.status_code,
+            counter.count, counter.duration * 1000, render * 1000,
+            total * 1000, size,
+        )
+        self.check_budget(request.method, view, counter.count)
+        return response
+
+    def process_template_response(self, request, response):
+        request.render_started = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: setattr(
+                request, 'render_finished', time.perf_counter()
+            )
+        )
+        return response
+
+    def get_view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name or match.route
+
+    def check_budget(self, method, view, count):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(f'{method} {view}')
+        if budget is None and method in ('GET', 'HEAD'):
+            budget = budgets.get(view)
+        if budget is None or count <= budget:
+            return
+        message = (
+            f'{method} {view}: {count} SQL-запросов при лимите {budget}'
+        )
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceededError(message)
+        logger.warning(message)
+
+
+class ConnectionHealthCheckMiddleware:
+    """Проверка постоянных соединений с БД перед обработкой запроса.
+
+    Включается настройкой CONN_HEALTH_CHECKS и нужна только при
+    CONN_MAX_AGE > 0. Стоит первой, чтобы проверочный запрос не учитывался
+    в лимитах PerformanceMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(settings, 'CONN_HEALTH_CHECKS', False):
+            close_unusable_connections()
+        return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Направление чтения безопасных запросов к API на реплики.
+
+    GET и HEAD к представлениям из пакета api читают через ReplicaRouter
+    с одной случайно выбранной на запрос реплики. После успешного изменяющего запроса клиент на
+    REPLICA_PIN_SECONDS закрепляется за primary, чтобы видеть собственные
+    изменения до того, как они дойдут до реплик. Клиент с токеном
+    закрепляется по хешу заголовка Authorization в общем кеше, клиенту
+    без токена (в том числе после входа) выставляется cookie
+    REPLICA_PIN_COOKIE. Без реплик middleware отключается, а с ними
+    требует общего для всех процессов кеша.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.replicas = get_replicas()
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        if not is_cache_shared():
+            raise ImproperlyConfigured(
+                'Для чтения с реплик нужен общий кеш (CACHE_BACKEND): '
+                'закрепление клиентов за primary должно быть видно всем '
+                'процессам'
+            )
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        self.pin_cookie = getattr(
+            settings, 'REPLICA_PIN_COOKIE', 'replica_pin'
+        )
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                use_replica.reset(request.replica_token)
+        if (
+            request.method not in self.safe_methods
+            and response.status_code < 400
+        ):
+            self.pin(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in self.safe_methods
+            and view_func.__module__.startswith('api.')
+            and not self.is_pinned(request)
+        ):
+            request.replica_token = use_replica.set(
+                random.choice(self.replicas)
+            )
+
+    def get_pin_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return 'replica-pin:' + hashlib.sha256(
+            authorization.encode()
+        ).hexdigest()
+
+    def is_pinned(self, request):
+        if self.pin_cookie in request.COOKIES:
+            return True
+        key = self.get_pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def pin(self, request, response):
+        key = self.get_pin_key(request)
+        if key is not None:
+            cache.set(key, True, self.pin_seconds)
+            return
+        response.set_cookie(
+            self.pin_cookie, '1', max_age=self.pin_seconds,
+            httponly=True, samesite='Lax'
+        )
@@ -0,0 +1,25 @@
+class ComputedFieldsMixin:
+    """Полное сохранение модели без вычисляемых полей.
+
+    Поля из computed_fields (счетчики, суммы, поисковый вектор) меняются
+    только атомарными UPDATE и триггерами. save() без update_fields у уже
+    существующей записи обновляет все остальные загруженные поля, чтобы
+    не затирать такие изменения значениями из устаревшей копии объекта.
+    """
+    computed_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.computed_fields
+                and field.attname not in deferred
+            ]
+        return super().save(*args, **kwargs)
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -30,10 +31,14 @@ INSTALLED_APPS = [
     'django_filters',
 
     'recipes.apps.RecipesConfig',
-    'users.apps.UsersConfig'
+    'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.ConnectionHealthCheckMiddleware',
+    'foodgram.middleware.PerformanceMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,7 +79,39 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', '1074'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DISABLE_SERVER_SIDE_CURSORS', 'false'
+        ).lower() == 'true',
+    }
+}
+
+# Реплики только для чтения: REPLICA_HOSTS=host1,host2 (порт, имя базы и
+# учетные данные те же, что у primary)
+for number, host in enumerate(filter(None, os.getenv(
+    'REPLICA_HOSTS', ''
+).split(','))):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+CONN_HEALTH_CHECKS = (
+    os.getenv('CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
     }
 }
 
@@ -143,6 +180,45 @@ DJOSER = {
     }
 }
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('PERFORMANCE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'foodgram.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+QUERY_BUDGETS = {
+    'recipes:recipes-list': 7,
+    'recipes:recipes-detail': 7,
+    'recipes:recipes-cookable': 7,
+    'recipes:recipes-feed': 8,
+    'recipes:tags-list': 2,
+    'recipes:ingredients-list': 3,
+    'users:subscriptions': 5,
+    'POST recipes:recipes-favorite-bulk': 6,
+    'DELETE recipes:recipes-favorite-bulk': 6,
+    'POST recipes:recipes-shopping-cart-bulk': 6,
+    'DELETE recipes:recipes-shopping-cart-bulk': 6,
+    'POST users:subscribe-bulk': 6,
+    'DELETE users:subscribe-bulk': 6,
+}
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'false').lower() == 'true'
+
 
 LENGTH_10 = 10
 LENGTH_200 = 200
@@ -150,3 +226,34 @@ LENGTH_254 = 254
 MAX_AMOUNT = 1000
 MAX_TIME = 300
 MIN = 1
+SHOPPING_LIST_CHUNK_SIZE = 100
+SHOPPING_LIST_CACHE_TIMEOUT = 24 * 60 * 60
+SHOPPING_LIST_CACHE_MAX_ROWS = 1000
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_INFIX_MIN_LENGTH = 3
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 60 * 60))
+USER_RECIPE_IDS_CACHE_TIMEOUT = 24 * 60 * 60
+MAX_RECIPES_LIMIT = 100
+COOKABLE_MAX_INGREDIENTS = 100
+BULK_MAX_ITEMS = 100
+ROLLUPS_BATCH_SIZE = 10000
+FEED_JOIN_MAX_AUTHORS = 200
+FEED_TIMELINE_SIZE = 500
+FEED_TIMELINE_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_FAN_OUT_BATCH_SIZE = 1000
+RECIPE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 6000
+RECIPE_IMAGE_SIZE = (1200, 1200)
+RECIPE_THUMBNAIL_SIZE = (480, 480)
+RECIPE_IMAGE_FORMAT = os.getenv('RECIPE_IMAGE_FORMAT', 'JPEG')
+RECIPE_IMAGE_QUALITY = 85
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'false').lower() == 'true'
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_TIMEOUT = 10 * 60
+JOBS_POLL_INTERVAL = 1
+JOBS_KEEP_DAYS = 7
+JOBS_PERIODIC = {
+    'recipes.recount_counters': 24 * 60 * 60,
+    'jobs.cleanup': 24 * 60 * 60,
+}
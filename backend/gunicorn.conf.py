@@ -0,0 +1,63 @@
+# Настройки gunicorn: gunicorn -c gunicorn.conf.py foodgram.wsgi:application
+# Любое значение можно переопределить переменной окружения GUNICORN_*.
+import os
+
+
+def get_cpu_count():
+    '''Доступные процессу ядра с учетом квоты cgroup v2'''
+    count = len(os.sched_getaffinity(0))
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+    except (OSError, ValueError):
+        return count
+    if quota == 'max':
+        return count
+    return max(1, min(count, int(quota) // int(period)))
+
+
+def get_memory_limit():
+    '''Лимит памяти контейнера (cgroup v2) или объем памяти машины'''
+    try:
+        with open('/sys/fs/cgroup/memory.max') as file:
+            limit = file.read().strip()
+        if limit != 'max':
+            return int(limit)
+    except (OSError, ValueError):
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+def get_workers():
+    '''2 * CPU + 1 воркеров, но не больше, чем помещается в память'''
+    if os.getenv('GUNICORN_WORKERS'):
+        return int(os.getenv('GUNICORN_WORKERS'))
+    worker_memory = int(os.getenv('GUNICORN_WORKER_MEMORY_MB', 150)) << 20
+    return max(1, min(
+        get_cpu_count() * 2 + 1, get_memory_limit() // worker_memory
+    ))
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = get_workers()
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Перезапуск воркеров против утечек памяти; разброс, чтобы воркеры не
+# перезапускались одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Приложение загружается в мастере до fork и делится между воркерами
+# через copy-on-write. С автоперезагрузкой кода несовместимо.
+reload = os.getenv('GUNICORN_RELOAD', 'false').lower() == 'true'
+preload_app = not reload
+
+# Больше keepalive_timeout в upstream nginx (60s), чтобы соединение
+# закрывал nginx, а не gunicorn посреди запроса.
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+accesslog = '-'
+errorlog = '-'
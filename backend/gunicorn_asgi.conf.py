@@ -0,0 +1,15 @@
+# Настройки gunicorn для ASGI:
+# gunicorn -c gunicorn_asgi.conf.py foodgram.asgi:application
+# Все настройки, кроме класса воркеров, берутся из gunicorn.conf.py.
+import os
+import runpy
+
+globals().update(
+    (name, value)
+    for name, value in runpy.run_path(
+        os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py')
+    ).items()
+    if not name.startswith('__')
+)
+
+worker_class = 'uvicorn.workers.UvicornWorker'
@@ -0,0 +1,49 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim, run_job, schedule_periodic
+from foodgram.db import close_unusable_connections
+from foodgram.settings import (
+    CONN_HEALTH_CHECKS, JOBS_PERIODIC, JOBS_POLL_INTERVAL
+)
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, с'
+        )
+
+    def stop(self, *args):
+        self.running = False
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logging.info('Воркер очереди задач запущен')
+        while self.running:
+            close_old_connections()
+            if CONN_HEALTH_CHECKS:
+                close_unusable_connections()
+            if run_job(claim()) is not None:
+                continue
+            if options['burst']:
+                break
+            schedule_periodic(JOBS_PERIODIC)
+            time.sleep(options['interval'])
+        logging.info('Воркер очереди задач остановлен')
@@ -0,0 +1,142 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.models import Job
+from foodgram.settings import (
+    JOBS_EAGER, JOBS_RETRY_DELAY, JOBS_TIMEOUT
+)
+
+
+logger = logging.getLogger('foodgram.jobs')
+
+REGISTRY = {}
+
+
+def job(name):
+    '''Регистрация функции как фоновой задачи с именем name'''
+    def decorator(func):
+        REGISTRY[name] = func
+        func.job_name = name
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, delay=0, **payload):
+    '''Постановка задачи в очередь.
+
+    Задача с уже известным ключом идемпотентности повторно не создается.
+    Запись появляется в базе вместе с текущей транзакцией, поэтому
+    воркер не увидит задачу раньше данных, которые она обрабатывает.
+    В режиме JOBS_EAGER задача выполняется в этом же процессе сразу после
+    фиксации транзакции.
+    '''
+    if name not in REGISTRY:
+        raise KeyError(f'Неизвестная задача: {name}')
+    fields = {
+        'name': name,
+        'payload': payload,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        queued = Job.objects.create(**fields)
+        created = True
+    else:
+        queued, created = Job.objects.get_or_create(
+            idempotency_key=key, defaults=fields
+        )
+    if created and JOBS_EAGER:
+        transaction.on_commit(lambda: run_job(claim(queued.pk)))
+    return queued
+
+
+def claim(pk=None):
+    '''Захват следующей готовой задачи с блокировкой строки.
+
+    Задачи, зависшие в статусе «выполняется» дольше JOBS_TIMEOUT,
+    считаются брошенными упавшим воркером и запускаются снова, пока не
+    исчерпаны попытки, а затем отмечаются как ошибочные.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.PENDING, run_at__lte=now)
+            | Q(
+                status=Job.RUNNING,
+                started_at__lt=now - timedelta(seconds=JOBS_TIMEOUT)
+            )
+        ).order_by('run_at', 'id')
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        while True:
+            queued = queryset.first()
+            if queued is None:
+                return None
+            if queued.status == Job.PENDING:
+                break
+            queued.last_error = (
+                f'Задача не завершилась за {JOBS_TIMEOUT} с, попытка '
+                f'{queued.attempts}'
+            )
+            if queued.attempts < queued.max_attempts:
+                break
+            queued.status = Job.FAILED
+            queued.finished_at = now
+            queued.save(update_fields=(
+                'status', 'finished_at', 'last_error'
+            ))
+            logger.warning(
+                'job=%s id=%s status=%s attempt=%d timeout',
+                queued.name, queued.pk, queued.status, queued.attempts
+            )
+        queued.status = Job.RUNNING
+        queued.attempts += 1
+        queued.started_at = now
+        queued.save(update_fields=(
+            'status', 'attempts', 'started_at', 'last_error'
+        ))
+    return queued
+
+
+def run_job(queued):
+    '''Выполнение задачи с повтором при ошибке и замером времени'''
+    if queued is None:
+        return None
+    started = time.perf_counter()
+    try:
+        REGISTRY[queued.name](**queued.payload)
+    except Exception:
+        queued.last_error = traceback.format_exc()
+        if queued.attempts < queued.max_attempts:
+            queued.status = Job.PENDING
+            queued.run_at = timezone.now() + timedelta(
+                seconds=JOBS_RETRY_DELAY * 2 ** (queued.attempts - 1)
+            )
+        else:
+            queued.status = Job.FAILED
+    else:
+        queued.status = Job.DONE
+    queued.duration = time.perf_counter() - started
+    queued.finished_at = timezone.now()
+    queued.save(update_fields=(
+        'status', 'run_at', 'duration', 'finished_at', 'last_error'
+    ))
+    log = logger.info if queued.status == Job.DONE else logger.warning
+    log(
+        'job=%s id=%s status=%s attempt=%d duration_ms=%.1f',
+        queued.name, queued.pk, queued.status, queued.attempts,
+        queued.duration * 1000,
+    )
+    return queued
+
+
+def schedule_periodic(periodic):
+    '''Постановка периодических задач: одна задача на каждый период'''
+    now = time.time()
+    for name, period in periodic.items():
+        enqueue(name, key=f'periodic:{name}:{int(now // period)}')
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import job
+from foodgram.settings import JOBS_KEEP_DAYS
+
+
+@job('jobs.cleanup')
+def cleanup():
+    '''Удаление выполненных задач старше JOBS_KEEP_DAYS дней'''
+    Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(days=JOBS_KEEP_DAYS)
+    ).delete()
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from recipes.models import (
-    Tag, Recipe, Favorite, ShoppingCart, Ingredient, RecipeIngredient
+    Tag, Recipe, Favorite, ShoppingCart, Ingredient, IngredientAttribute,
+    RecipeIngredient
 )
 
 
@@ -17,6 +18,10 @@ class TagsInline(admin.TabularInline):
     min_num = 1
 
 
+class IngredientAttributeInline(admin.StackedInline):
+    model = IngredientAttribute
+
+
 @admin.register(Tag)
 class TagsAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'color', 'slug')
@@ -33,11 +38,14 @@ class IngredientsAdmin(admin.ModelAdmin):
     list_filter = ('name',)
     search_fields = ('name',)
     empty_value_display = '-пусто-'
+    inlines = (IngredientAttributeInline,)
 
 
 @admin.register(Recipe)
 class RecipesAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'favorites_count')
+    list_display = (
+        'pk', 'name', 'author', 'favorites_count', 'calories', 'cost'
+    )
     fields = (
         'name', 'author', 'image', 'description',
         'cooking_time'
@@ -47,9 +55,7 @@ class RecipesAdmin(admin.ModelAdmin):
     list_filter = ('name', 'tags', 'author')
     empty_value_display = '-пусто-'
     inlines = (IngredientsInline, TagsInline)
-
-    def favorites_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+    list_select_related = ('author',)
 
 
 @admin.register(Favorite)
@@ -0,0 +1,159 @@
+import hashlib
+import time
+from array import array
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.cache import is_cache_shared
+from foodgram.settings import (
+    CATALOGUE_CACHE_TIMEOUT, USER_RECIPE_IDS_CACHE_TIMEOUT
+)
+
+
+def get_version_key(model):
+    return f'catalogue:{model._meta.label_lower}:version'
+
+
+def get_version(key):
+    '''Версия данных: время их последнего изменения'''
+    version = cache.get(key)
+    if version is not None:
+        return version
+    version = time.time()
+    if cache.add(key, version, None):
+        return version
+    return cache.get(key, version)
+
+
+def bump_version(key):
+    cache.set(key, time.time(), None)
+
+
+def get_catalogue_version(model):
+    return get_version(get_version_key(model))
+
+
+def bump_catalogue_version(model):
+    '''Сброс всех закешированных данных справочника после фиксации
+    транзакции: иначе параллельный запрос может закешировать под новой
+    версией еще не измененные данные'''
+    key = get_version_key(model)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_catalogue(model, name, build):
+    '''Данные справочника из кеша или результат build().
+
+    Кешируются только в общем для всех процессов кеше: в локальном кеше
+    новую версию справочника увидел бы только процесс, изменивший его.
+    '''
+    if not is_cache_shared():
+        return build()
+    digest = hashlib.md5(name.encode()).hexdigest()
+    key = (
+        f'catalogue:{model._meta.label_lower}:'
+        f'{get_catalogue_version(model)}:{digest}'
+    )
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, CATALOGUE_CACHE_TIMEOUT)
+    return data
+
+
+def get_catalogue_etag(model):
+    if not is_cache_shared():
+        return None
+    return f'"{model._meta.model_name}-{get_catalogue_version(model)}"'
+
+
+def get_catalogue_last_modified(model):
+    if not is_cache_shared():
+        return None
+    return datetime.fromtimestamp(
+        get_catalogue_version(model), tz=timezone.utc
+    )
+
+
+def get_recipe_ids_version_key(model, user_id):
+    return f'recipe-ids:{model._meta.model_name}:{user_id}:version'
+
+
+def pack_ids(ids):
+    '''Компактное представление id: 4 или 8 байт на число'''
+    typecode = 'I' if not ids or max(ids) < 2 ** 32 else 'Q'
+    return typecode, array(typecode, sorted(ids)).tobytes()
+
+
+def unpack_ids(packed):
+    typecode, data = packed
+    ids = array(typecode)
+    ids.frombytes(data)
+    return frozenset(ids)
+
+
+def get_recipe_ids(model, user_id):
+    '''id рецептов пользователя в избранном или списке покупок.
+
+    Кешируются только в общем для всех процессов кеше: сброс в локальном
+    кеше виден одному воркеру. Ключ содержит версию, которая меняется
+    после фиксации изменений, поэтому набор, прочитанный до фиксации,
+    остается под старым ключом и не подменяет свежий.
+    '''
+    # Без сортировки по умолчанию, которая добавляет JOIN рецептов и
+    # пользователей
+    queryset = model.objects.filter(user_id=user_id).order_by().values_list(
+        'recipe_id', flat=True
+    )
+    if not is_cache_shared():
+        return frozenset(queryset)
+    version = get_version(get_recipe_ids_version_key(model, user_id))
+    key = f'recipe-ids:{model._meta.model_name}:{user_id}:{version}'
+    packed = cache.get(key)
+    if packed is not None:
+        return unpack_ids(packed)
+    ids = frozenset(queryset)
+    cache.add(key, pack_ids(ids), USER_RECIPE_IDS_CACHE_TIMEOUT)
+    return ids
+
+
+def get_request_recipe_ids(request, model):
+    '''get_recipe_ids для текущего пользователя, один раз за запрос'''
+    if request.user.is_anonymous:
+        return frozenset()
+    if not hasattr(request, 'recipe_ids'):
+        request.recipe_ids = {}
+    if model not in request.recipe_ids:
+        request.recipe_ids[model] = get_recipe_ids(model, request.user.pk)
+    return request.recipe_ids[model]
+
+
+def invalidate_recipe_ids(model, user_id):
+    '''Сброс кеша после фиксации транзакции, изменившей избранное/корзину'''
+    key = get_recipe_ids_version_key(model, user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_cart_version_key(user_id):
+    return f'shopping-cart:{user_id}:version'
+
+
+def get_cart_version(user_id):
+    return get_version(get_cart_version_key(user_id))
+
+
+def bump_cart_version(user_id):
+    '''Сброс закешированного списка покупок после изменения корзины'''
+    key = get_cart_version_key(user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def bump_cart_versions(user_ids):
+    '''Сброс закешированных списков покупок нескольких пользователей
+    одной записью в кеш'''
+    version = time.time()
+    cache.set_many({
+        get_cart_version_key(user_id): version for user_id in user_ids
+    }, None)
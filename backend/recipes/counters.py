@@ -0,0 +1,45 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscription, User
+
+
+def update_counter(model, pks, field, delta):
+    '''Атомарное изменение счетчика одним UPDATE'''
+    if isinstance(pks, int):
+        pks = (pks,)
+    model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        Value(0)
+    )
+
+
+COUNTERS = (
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+)
+
+
+def recount_counters():
+    '''Пересчет всех счетчиков, возвращает число исправленных строк'''
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        actual = count_subquery(related_model, related_field)
+        fixed[f'{model._meta.model_name}.{field}'] = model.objects.annotate(
+            actual=actual
+        ).exclude(
+            **{field: F('actual')}
+        ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,100 @@
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.cache import pack_ids, unpack_ids
+from recipes.models import Recipe
+from users.models import Subscription
+from foodgram.cache import is_cache_shared
+from foodgram.settings import (
+    FEED_FAN_OUT_BATCH_SIZE, FEED_JOIN_MAX_AUTHORS,
+    FEED_TIMELINE_CACHE_TIMEOUT, FEED_TIMELINE_SIZE
+)
+
+
+# Значение в кеше для пользователей, чья лента собирается запросом
+JOIN = 'join'
+
+
+def get_timeline_key(user_id):
+    return f'feed:{user_id}'
+
+
+def build_timeline(user_id):
+    '''id последних FEED_TIMELINE_SIZE рецептов авторов из подписок'''
+    return list(Recipe.objects.for_subscriber(user_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', flat=True)[:FEED_TIMELINE_SIZE])
+
+
+def get_timeline(user_id):
+    '''Закешированная лента пользователя.
+
+    Пока подписок не больше FEED_JOIN_MAX_AUTHORS, возвращается None:
+    такую ленту дешевле выбрать одним запросом через подписки. Иначе
+    возвращаются id последних рецептов ленты. Ленты хранятся только в
+    общем кеше: новые рецепты добавляет в них контейнер worker, и
+    локальный кеш веб-процесса об этом не узнает.
+    '''
+    if not is_cache_shared():
+        return None
+    key = get_timeline_key(user_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = JOIN
+        if Subscription.objects.filter(
+            user_id=user_id
+        ).count() > FEED_JOIN_MAX_AUTHORS:
+            timeline = pack_ids(build_timeline(user_id))
+        cache.set(key, timeline, FEED_TIMELINE_CACHE_TIMEOUT)
+    if timeline == JOIN:
+        return None
+    return unpack_ids(timeline)
+
+
+def get_feed(queryset, user_id):
+    '''Рецепты ленты пользователя из queryset'''
+    timeline = get_timeline(user_id)
+    if timeline is None:
+        return queryset.for_subscriber(user_id)
+    return queryset.filter(pk__in=timeline)
+
+
+def push_to_timelines(recipe_id, author_id):
+    '''Добавление нового рецепта в закешированные ленты подписчиков.
+
+    Ленты, которых нет в кеше, соберутся при следующем чтении. В ленте
+    остаются FEED_TIMELINE_SIZE наибольших id: рецепты получают id в
+    порядке публикации.
+    '''
+    if not is_cache_shared():
+        return
+    keys = (
+        get_timeline_key(user_id)
+        for user_id in Subscription.objects.filter(
+            author_id=author_id
+        ).order_by().values_list('user_id', flat=True).iterator(
+            chunk_size=FEED_FAN_OUT_BATCH_SIZE
+        )
+    )
+    while True:
+        batch = list(islice(keys, FEED_FAN_OUT_BATCH_SIZE))
+        if not batch:
+            break
+        timelines = {}
+        for key, timeline in cache.get_many(batch).items():
+            if timeline == JOIN:
+                continue
+            ids = unpack_ids(timeline)
+            if recipe_id not in ids:
+                timelines[key] = pack_ids(
+                    sorted(ids | {recipe_id})[-FEED_TIMELINE_SIZE:]
+                )
+        cache.set_many(timelines, FEED_TIMELINE_CACHE_TIMEOUT)
+
+
+def invalidate_timeline(user_id):
+    '''Сброс ленты после фиксации транзакции, изменившей подписки'''
+    key = get_timeline_key(user_id)
+    transaction.on_commit(lambda: cache.delete(key))
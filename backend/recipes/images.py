@@ -0,0 +1,80 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from jobs.queue import enqueue, job
+from recipes.models import Recipe
+from foodgram.settings import (
+    RECIPE_IMAGE_FORMAT, RECIPE_IMAGE_QUALITY, RECIPE_IMAGE_SIZE,
+    RECIPE_THUMBNAIL_SIZE
+)
+
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def encode(image, size):
+    '''Уменьшение изображения до size и сжатие в RECIPE_IMAGE_FORMAT'''
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(
+        buffer, RECIPE_IMAGE_FORMAT,
+        quality=RECIPE_IMAGE_QUALITY, optimize=True
+    )
+    return ContentFile(buffer.getvalue())
+
+
+@job('recipes.process_image')
+def process_recipe_image(recipe_id):
+    '''Перекодирование изображения рецепта и создание миниатюры'''
+    recipe = Recipe.objects.only('image').filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    source_name = recipe.image.name
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    base_name = os.path.splitext(os.path.basename(source_name))[0]
+    file_name = f'{base_name}.{EXTENSIONS[RECIPE_IMAGE_FORMAT]}'
+    storage = recipe.image.storage
+    image_name = storage.save(
+        recipe.image.field.generate_filename(recipe, file_name),
+        encode(image, RECIPE_IMAGE_SIZE)
+    )
+    thumbnail_name = storage.save(
+        Recipe.thumbnail.field.generate_filename(recipe, file_name),
+        encode(image, RECIPE_THUMBNAIL_SIZE)
+    )
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=source_name
+    ).update(image=image_name, thumbnail=thumbnail_name)
+    if updated:
+        storage.delete(source_name)
+    else:
+        storage.delete(image_name)
+        storage.delete(thumbnail_name)
+
+
+def schedule_recipe_image(recipe):
+    '''Постановка обработки изображения рецепта в очередь задач'''
+    enqueue(
+        process_recipe_image.job_name,
+        key=f'recipe-image:{recipe.pk}:{recipe.image.name}',
+        recipe_id=recipe.pk
+    )
+
+
+def discard_recipe_files(recipe):
+    '''Удаление текущих файлов изображения и миниатюры рецепта после
+    фиксации транзакции, которая их заменила'''
+    storage = recipe.image.storage
+    names = [file.name for file in (recipe.image, recipe.thumbnail) if file]
+
+    def delete():
+        for name in names:
+            storage.delete(name)
+
+    transaction.on_commit(delete)
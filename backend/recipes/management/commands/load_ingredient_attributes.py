@@ -0,0 +1,135 @@
+import csv
+import json
+import logging
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from jobs.queue import enqueue
+from recipes.cache import bump_catalogue_version
+from recipes.models import Ingredient, IngredientAttribute
+from recipes.tasks import update_rollups_job
+
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_BATCH_SIZE = 1000
+FIELDS = ('energy', 'price', 'grams_per_unit')
+
+
+def read_csv(file):
+    '''Колонки: название, единица, ккал на 100 г, цена, грамм в единице'''
+    for row in csv.reader(file):
+        if len(row) >= 5:
+            yield row[:5]
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield (
+            item.get('name', ''), item.get('measurement_unit', ''),
+            *(item.get(field) for field in FIELDS)
+        )
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def to_decimal(value):
+    if value in (None, ''):
+        return None
+    return Decimal(str(value).strip().replace(',', '.'))
+
+
+class Command(BaseCommand):
+    help = 'Пакетная загрузка калорийности и цен ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу с характеристиками (.csv или .json)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном запросе'
+        )
+
+    def get_rows(self, path):
+        '''Пары (название, единица измерения) и значения характеристик'''
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        with open(path, 'r', encoding='UTF-8') as file:
+            for name, measurement_unit, *values in READERS[extension](file):
+                try:
+                    values = [to_decimal(value) for value in values]
+                except InvalidOperation:
+                    logging.warning(
+                        f'Пропущена строка: {name}, {measurement_unit}'
+                    )
+                    continue
+                yield (
+                    (name.strip(), measurement_unit.strip()),
+                    dict(zip(FIELDS, values))
+                )
+
+    def save_batch(self, batch):
+        '''Обновление существующих и создание новых строк пакетом'''
+        ingredients = {
+            (name, measurement_unit): pk
+            for name, measurement_unit, pk in Ingredient.objects.filter(
+                name__in={name for (name, _), _ in batch}
+            ).values_list('name', 'measurement_unit', 'pk')
+        }
+        attributes = {
+            ingredients[key]: IngredientAttribute(
+                ingredient_id=ingredients[key], **values
+            )
+            for key, values in batch if key in ingredients
+        }
+        existing = set(IngredientAttribute.objects.filter(
+            pk__in=attributes
+        ).values_list('pk', flat=True))
+        IngredientAttribute.objects.bulk_update(
+            [attributes[pk] for pk in existing], FIELDS
+        )
+        IngredientAttribute.objects.bulk_create(
+            [value for pk, value in attributes.items() if pk not in existing]
+        )
+        return len(attributes)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+
+        logging.info('Загрузка характеристик ингредиентов запущена')
+        started = time.monotonic()
+        rows = self.get_rows(options['path'])
+        total = saved = 0
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                total += len(batch)
+                saved += self.save_batch(batch)
+                logging.info(f'Обработано строк: {total}')
+            # bulk-операции не отправляют сигналов: пересчет рецептов в фоне
+            # и сброс списков покупок, где вес единиц используется для
+            # слияния строк
+            enqueue(update_rollups_job.job_name)
+            bump_catalogue_version(IngredientAttribute)
+
+        elapsed = time.monotonic() - started
+        logging.info(
+            f'Загрузка характеристик ингредиентов завершена: строк {total}, '
+            f'сохранено {saved}, не найдено ингредиентов {total - saved}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+        )
@@ -1,28 +1,124 @@
 import csv
+import json
 import logging
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
-from rest_framework.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from recipes.models import Ingredient
-from django.db.utils import IntegrityError
+from recipes.signals import invalidate_catalogue
+from foodgram.settings import LENGTH_10, LENGTH_200
 
 
 logging.basicConfig(level=logging.INFO)
 
+DEFAULT_PATH = 'data/ingredients.csv'
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item.get('name', ''), item.get('measurement_unit', '')
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
 
 class Command(BaseCommand):
+    help = 'Пакетная загрузка ингредиентов из CSV или JSON файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help='Путь к файлу с ингредиентами (.csv или .json)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Разобрать файл и посчитать новые строки без записи в базу'
+        )
+
+    def get_rows(self, path):
+        '''Уникальные корректные пары (название, единица измерения)'''
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        seen = set()
+        with open(path, 'r', encoding='UTF-8') as file:
+            for name, measurement_unit in READERS[extension](file):
+                name = name.strip()
+                measurement_unit = measurement_unit.strip()
+                if (
+                    not name or not measurement_unit
+                    or len(name) > LENGTH_200
+                    or len(measurement_unit) > LENGTH_10
+                ):
+                    logging.warning(
+                        f'Пропущена строка: {name}, {measurement_unit}'
+                    )
+                    continue
+                if (name, measurement_unit) in seen:
+                    continue
+                seen.add((name, measurement_unit))
+                yield name, measurement_unit
+
     def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+
         logging.info('Заполнение модели ингредиентов запущено')
-        with open('data/ingredients.csv', 'r', encoding='UTF-8') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                try:
-                    Ingredient.objects.create(
-                        name=row[0],
-                        measurement_unit=row[1],
-                    )
-                except IntegrityError:
-                    raise ValidationError('alredy exist')
+        started = time.monotonic()
+        total = 0
+        rows = self.get_rows(path)
+        count_before = Ingredient.objects.count()
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        ) if dry_run else set()
+        new = 0
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                total += len(batch)
+                if dry_run:
+                    new += sum(1 for row in batch if row not in existing)
+                    continue
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in batch
+                    ),
+                    batch_size=batch_size,
+                    ignore_conflicts=True
+                )
+                logging.info(f'Обработано строк: {total}')
+        if not dry_run:
+            new = Ingredient.objects.count() - count_before
+            invalidate_catalogue(Ingredient)
 
-        logging.info('Заполнение модели ингредиентов завершено')
+        elapsed = time.monotonic() - started
+        logging.info(
+            f'Заполнение модели ингредиентов завершено'
+            f'{" (пробный запуск)" if dry_run else ""}: '
+            f'строк {total}, новых {new}, пропущено дублей {total - new}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+        )
@@ -0,0 +1,21 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_counters
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков рецептов, подписчиков и избранного'
+
+    def handle(self, *args, **options):
+        logging.info('Пересчет счетчиков запущен')
+        with transaction.atomic():
+            fixed = recount_counters()
+        for counter, count in fixed.items():
+            logging.info(f'{counter}: исправлено строк {count}')
+        logging.info('Пересчет счетчиков завершен')
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipeingredient_ingredient_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientAttribute',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='attribute', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('energy', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, verbose_name='Калорийность, ккал на 100 г')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена за единицу измерения')),
+                ('grams_per_unit', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True, verbose_name='Грамм в единице измерения')),
+            ],
+            options={
+                'verbose_name': 'Характеристики ингредиента',
+                'verbose_name_plural': 'Характеристики ингредиентов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Калорийность, ккал'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Примерная стоимость'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories'], name='recipe_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cost'], name='recipe_cost_idx'),
+        ),
+    ]
@@ -1,12 +1,35 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Cast
 from django.core.validators import MinValueValidator, MaxValueValidator
 from colorfield.fields import ColorField
 
-from users.models import User
+from foodgram.models import ComputedFieldsMixin
+from users.models import Subscription, User
 from foodgram.settings import (
     LENGTH_10, LENGTH_200, MAX_AMOUNT, MAX_TIME, MIN
 )
 
+# id рецептов, для которых сигналы связанных строк не пересчитывают суммы
+# и счетчики: рецепт удаляется целиком или пересчитывается явно
+skipped_recipe_ids = ContextVar('skipped_recipe_ids', default=frozenset())
+
+
+@contextmanager
+def skip_recipe_signals(recipe_ids):
+    """Пропуск пересчетов рецептов recipe_ids на время блока"""
+    token = skipped_recipe_ids.set(
+        skipped_recipe_ids.get() | frozenset(recipe_ids)
+    )
+    try:
+        yield
+    finally:
+        skipped_recipe_ids.reset(token)
+
 
 class Ingredient(models.Model):
     """Класс для хранения ингредиентов в базе данных"""
@@ -34,6 +57,45 @@ class Ingredient(models.Model):
         return self.name
 
 
+class IngredientAttribute(models.Model):
+    """Пищевая ценность и цена ингредиента для расчета рецептов"""
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='attribute',
+        verbose_name='Ингредиент'
+    )
+    energy = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Калорийность, ккал на 100 г'
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Цена за единицу измерения'
+    )
+    grams_per_unit = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        verbose_name='Грамм в единице измерения'
+    )
+
+    class Meta:
+        verbose_name = 'Характеристики ингредиента'
+        verbose_name_plural = 'Характеристики ингредиентов'
+
+    def __str__(self):
+        return str(self.ingredient)
+
+
 class Tag(models.Model):
     """Теги рецептов"""
     COLOR_PALETTE = [
@@ -64,7 +126,82 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам"""
+
+    def delete(self):
+        """Удаление без пересчетов по строкам, удаляемым каскадом"""
+        with skip_recipe_signals(self.values_list('pk', flat=True)):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def with_related(self):
+        """Подгрузка автора, тегов и ингредиентов без N+1 запросов"""
+        return self.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def cookable(self, ingredient_ids):
+        """Рецепты хотя бы с одним из ингредиентов и доля этих ингредиентов.
+
+        Кандидаты отбираются по индексу (ingredient, recipe) связей, затем
+        для них считаются совпавшие (matched) и все (total) ингредиенты и
+        их отношение coverage.
+        """
+        return self.filter(models.Exists(RecipeIngredient.objects.filter(
+            recipe=models.OuterRef('pk'), ingredient_id__in=ingredient_ids
+        ))).annotate(
+            matched=models.Count(
+                'recipe_ingredients',
+                filter=models.Q(
+                    recipe_ingredients__ingredient_id__in=ingredient_ids
+                )
+            ),
+            total=models.Count('recipe_ingredients'),
+        ).annotate(
+            coverage=models.ExpressionWrapper(
+                Cast('matched', models.FloatField()) / models.F('total'),
+                output_field=models.FloatField()
+            )
+        )
+
+    def for_subscriber(self, user_id):
+        """Рецепты авторов, на которых подписан пользователь.
+
+        Подписки отбираются по индексу (user, author) уникального
+        ограничения, рецепты каждого автора — по индексу
+        (author, pub_date, id).
+        """
+        return self.filter(author_id__in=Subscription.objects.filter(
+            user_id=user_id
+        ).values('author_id'))
+
+    def with_user_flags(self, user):
+        """Аннотация подписки на автора.
+
+        Флаги избранного и корзины берутся из кеша id рецептов
+        пользователя (recipes.cache.get_recipe_ids).
+        """
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            author_is_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, author=models.OuterRef('author')
+            )),
+        )
+
+
+class Recipe(ComputedFieldsMixin, models.Model):
     """Модель рецепта"""
     author = models.ForeignKey(
         User,
@@ -86,6 +223,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение'
     )
+    thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра'
+    )
     description = models.TextField(
         verbose_name='Описание'
     )
@@ -104,18 +247,74 @@ class Recipe(models.Model):
     )
     tags = models.ManyToManyField(
         Tag,
+        through='RecipeTag',
         related_name='tag_recipes',
         verbose_name='Тег'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в избранное'
+    )
+    # Пересчитываются recipes.rollups.update_rollups
+    calories = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Калорийность, ккал'
+    )
+    cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name='Примерная стоимость'
+    )
+    # Заполняется триггером из миграции 0014_recipe_search_vector
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    computed_fields = (
+        'favorites_count', 'calories', 'cost', 'search_vector'
+    )
 
     class Meta:
         ordering = ('-pub_date', 'name')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+            models.Index(fields=['calories'], name='recipe_calories_idx'),
+            models.Index(fields=['cost'], name='recipe_cost_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Сохранение и обновление счетчиков в одной транзакции"""
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Удаление без пересчетов по строкам, удаляемым каскадом"""
+        with skip_recipe_signals((self.pk,)):
+            return super().delete(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     """Связи моделей рецепта и ингредиента"""
@@ -150,12 +349,49 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredient'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipeingr_ingr_recipe_idx'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.ingredient} в количестве {self.amount}шт. '
                 f'используется в рецепте {self.recipe}')
 
 
+class RecipeTag(models.Model):
+    """Связи моделей рецепта и тега"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recipe_tags',
+        verbose_name='Рецепт'
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='tag_recipe_links',
+        verbose_name='Тег'
+    )
+
+    class Meta:
+        db_table = 'recipes_recipe_tags'
+        verbose_name = 'Связь рецепта и тега'
+        verbose_name_plural = 'Связи рецептов и тегов'
+        unique_together = ('recipe', 'tag')
+        indexes = [
+            models.Index(
+                fields=['tag', 'recipe'],
+                name='recipetag_tag_recipe_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} с тегом {self.tag}'
+
+
 class AbstractFavoriteShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
@@ -174,13 +410,24 @@ class AbstractFavoriteShoppingCart(models.Model):
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'recipe'],
-                name='unique_Favorite_and_ShoppingCart'
+                name='unique_%(class)s_user_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='%(class)s_recipe_user_idx'
             )
         ]
 
+    def save(self, *args, **kwargs):
+        """Сохранение и обновление счетчиков в одной транзакции"""
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
 
 class Favorite(AbstractFavoriteShoppingCart):
-    class Meta:
+    class Meta(AbstractFavoriteShoppingCart.Meta):
         verbose_name = 'избранное'
         verbose_name_plural = 'избранное'
         default_related_name = 'favorite'
@@ -190,7 +437,7 @@ class Favorite(AbstractFavoriteShoppingCart):
 
 
 class ShoppingCart(AbstractFavoriteShoppingCart):
-    class Meta:
+    class Meta(AbstractFavoriteShoppingCart.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
         default_related_name = 'shopping_cart'
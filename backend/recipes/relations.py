@@ -0,0 +1,90 @@
+from django.db import connections, router, transaction
+
+from recipes.cache import bump_cart_version, invalidate_recipe_ids
+from recipes.counters import update_counter
+from recipes.feed import invalidate_timeline
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+# Модель связи -> (поле объекта, счетчик на объекте или None)
+RELATIONS = {
+    Favorite: ('recipe', (Recipe, 'favorites_count')),
+    ShoppingCart: ('recipe', None),
+    Subscription: ('author', (User, 'followers_count')),
+}
+
+
+def relations_changed(model, user_id, target_ids, delta):
+    '''Побочные эффекты сигналов для записей мимо ORM: счетчики, кеш id
+    рецептов, версия корзины и лента подписок'''
+    if not target_ids:
+        return
+    _, counter = RELATIONS[model]
+    if counter is not None:
+        counter_model, counter_field = counter
+        update_counter(counter_model, target_ids, counter_field, delta)
+    if model in (Favorite, ShoppingCart):
+        invalidate_recipe_ids(model, user_id)
+    if model is ShoppingCart:
+        bump_cart_version(user_id)
+    if model is Subscription:
+        invalidate_timeline(user_id)
+
+
+def get_columns(model):
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    return connection, quote(model._meta.db_table), quote(
+        model._meta.get_field('user').column
+    ), quote(model._meta.get_field(RELATIONS[model][0]).column)
+
+
+def insert_relations(model, user_id, targets):
+    '''INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING: связи с
+    объектами из queryset targets одним запросом, без гонки между
+    проверкой и вставкой. Возвращает id объектов новых связей.'''
+    connection, table, user_column, target_column = get_columns(model)
+    targets_sql, params = targets.order_by().values(
+        'pk'
+    ).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {target_column}) '
+            f'SELECT %s, target.id FROM ({targets_sql}) AS target '
+            f'WHERE TRUE ON CONFLICT DO NOTHING RETURNING {target_column}',
+            (user_id, *params)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_relations(model, user_id, target_ids):
+    '''DELETE ... RETURNING: удаление связей одним запросом, возвращает
+    id объектов, связи с которыми действительно были удалены'''
+    connection, table, user_column, target_column = get_columns(model)
+    target_ids = list(target_ids)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {target_column} IN ({placeholders}) '
+            f'RETURNING {target_column}',
+            (user_id, *target_ids)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic(savepoint=False)
+def add_relations(model, user, targets):
+    '''Добавление связей пользователя с объектами из targets'''
+    created = insert_relations(model, user.pk, targets)
+    relations_changed(model, user.pk, created, 1)
+    return created
+
+
+@transaction.atomic(savepoint=False)
+def remove_relations(model, user, target_ids):
+    '''Удаление связей пользователя с объектами по их id'''
+    deleted = delete_relations(model, user.pk, target_ids)
+    relations_changed(model, user.pk, deleted, -1)
+    return deleted
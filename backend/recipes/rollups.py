@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.db.models import (
+    DecimalField, ExpressionWrapper, F, IntegerField, Max, OuterRef,
+    Subquery, Sum, Value
+)
+from django.db.models.functions import Cast, Coalesce, Round
+
+from recipes.models import Recipe, RecipeIngredient
+from foodgram.settings import ROLLUPS_BATCH_SIZE
+
+
+CALORIES = ExpressionWrapper(
+    F('amount') * F('ingredient__attribute__grams_per_unit')
+    * F('ingredient__attribute__energy') / 100,
+    output_field=DecimalField()
+)
+COST = ExpressionWrapper(
+    F('amount') * F('ingredient__attribute__price'),
+    output_field=DecimalField()
+)
+
+
+def sum_subquery(expression):
+    return Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            total=Sum(expression)
+        ).values('total')
+    )
+
+
+def get_rollups():
+    '''Выражения для калорийности и стоимости рецепта по его ингредиентам.
+
+    Ингредиенты без характеристик (или без пересчета в граммы для
+    калорийности) в сумму не входят.
+    '''
+    return {
+        'calories': Coalesce(
+            Cast(Round(sum_subquery(CALORIES)), IntegerField()), Value(0)
+        ),
+        'cost': Coalesce(
+            sum_subquery(COST), Value(Decimal(0)),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+
+
+def update_rollups(**filters):
+    '''Пересчет рецептов, подходящих под filters, одним UPDATE'''
+    return Recipe.objects.filter(**filters).update(**get_rollups())
+
+
+def update_all_rollups(batch_size=ROLLUPS_BATCH_SIZE):
+    '''Пересчет всех рецептов пакетами по диапазонам id'''
+    last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    updated = 0
+    for start in range(0, last_id, batch_size):
+        updated += update_rollups(pk__gt=start, pk__lte=start + batch_size)
+    return updated
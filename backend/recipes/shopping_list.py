@@ -0,0 +1,138 @@
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.cache import (
+    bump_cart_versions, get_cart_version, get_catalogue_version
+)
+from recipes.models import (
+    Ingredient, IngredientAttribute, RecipeIngredient, ShoppingCart
+)
+from foodgram.cache import is_cache_shared
+from foodgram.settings import (
+    SHOPPING_LIST_CACHE_MAX_ROWS, SHOPPING_LIST_CACHE_TIMEOUT,
+    SHOPPING_LIST_CHUNK_SIZE
+)
+
+
+GRAM = 'г'
+
+# Единица измерения -> (базовая единица, множитель)
+UNIT_CONVERSIONS = {
+    'мг': (GRAM, Decimal('0.001')),
+    'кг': (GRAM, 1000),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 250),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+
+def get_rows(user_id):
+    '''Суммы по ингредиентам рецептов из корзины пользователя, строки
+    одного продукта идут подряд'''
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user_id=user_id
+    ).values(
+        'ingredient_id',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        grams_per_unit=F('ingredient__attribute__grams_per_unit'),
+    ).annotate(amount=Sum('amount')).order_by('name')
+
+
+def format_amount(amount):
+    if amount == int(amount):
+        return int(amount)
+    return float(round(amount, 3))
+
+
+def merge_product(rows):
+    '''Строки списка покупок для строк одного продукта'''
+    items = []
+    for row in rows:
+        unit, factor = UNIT_CONVERSIONS.get(
+            row['measurement_unit'], (row['measurement_unit'], 1)
+        )
+        items.append((unit, row['amount'] * factor, row))
+    mixed = len({unit for unit, _, _ in items}) > 1
+    amounts = defaultdict(Decimal)
+    for unit, amount, row in items:
+        if mixed and unit != GRAM and row['grams_per_unit'] is not None:
+            unit = GRAM
+            amount = row['amount'] * row['grams_per_unit']
+        amounts[unit] += amount
+    return sorted(amounts.items())
+
+
+def merge_rows(rows):
+    '''Приведение количеств к базовым единицам и слияние строк.
+
+    Строки одного продукта в совместимых единицах (кг и г, л и мл)
+    складываются. Если продукт записан в несовместимых единицах, строки
+    с известным весом единицы (IngredientAttribute.grams_per_unit)
+    переводятся в граммы. Строки должны быть упорядочены по названию:
+    в памяти держатся только строки текущего продукта.
+    '''
+    for name, product_rows in groupby(rows, key=itemgetter('name')):
+        for unit, amount in merge_product(product_rows):
+            yield {
+                'name': name,
+                'amount': format_amount(amount),
+                'measurement_unit': unit,
+            }
+
+
+def cache_shopping_list(key, lines):
+    '''Выдача строк с сохранением списка в кеш, если в нем не больше
+    SHOPPING_LIST_CACHE_MAX_ROWS строк'''
+    cached = []
+    for line in lines:
+        if cached is not None:
+            cached.append(line)
+            if len(cached) > SHOPPING_LIST_CACHE_MAX_ROWS:
+                cached = None
+        yield line
+    if cached is not None:
+        cache.add(key, cached, SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def get_shopping_list(user_id):
+    '''Строки списка покупок.
+
+    Список берется из общего кеша, версия которого меняется вместе с
+    корзиной, составом рецептов в ней и справочниками ингредиентов и их
+    характеристик. Иначе строки собираются по ходу чтения запроса через
+    серверный курсор, и в кеш попадают только короткие списки.
+    '''
+    lines = merge_rows(get_rows(user_id).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE
+    ))
+    if not is_cache_shared():
+        return lines
+    key = (
+        f'shopping-list:{user_id}:{get_cart_version(user_id)}:'
+        f'{get_catalogue_version(Ingredient)}:'
+        f'{get_catalogue_version(IngredientAttribute)}'
+    )
+    shopping_list = cache.get(key)
+    if shopping_list is not None:
+        return shopping_list
+    return cache_shopping_list(key, lines)
+
+
+def invalidate_shopping_lists(recipe_ids):
+    '''Сброс списков покупок пользователей, в корзине которых есть
+    рецепты recipe_ids, после фиксации транзакции'''
+    if not is_cache_shared():
+        return
+    transaction.on_commit(lambda: bump_cart_versions(
+        ShoppingCart.objects.filter(recipe_id__in=recipe_ids).values_list(
+            'user_id', flat=True
+        ).distinct()
+    ))
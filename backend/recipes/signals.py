@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from recipes.cache import (
+    bump_cart_version, bump_catalogue_version, get_catalogue_version,
+    invalidate_recipe_ids
+)
+from recipes.counters import update_counter
+from recipes.feed import invalidate_timeline
+from recipes.models import (
+    Favorite, Ingredient, IngredientAttribute, Recipe, RecipeIngredient,
+    ShoppingCart, Tag, skipped_recipe_ids
+)
+from recipes.rollups import update_rollups
+from recipes.shopping_list import invalidate_shopping_lists
+from recipes.tasks import (
+    fan_out_recipe_job, update_rollups_job, warm_catalogues
+)
+from users.models import Subscription, User
+from foodgram.cache import is_cache_shared
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalogue(sender, **kwargs):
+    # Без общего кеша справочники не кешируются
+    if not is_cache_shared():
+        return
+    bump_catalogue_version(sender)
+    # После фиксации, когда версия уже сменилась: ключ задачи — новая версия
+    transaction.on_commit(lambda: enqueue(
+        warm_catalogues.job_name,
+        key=f'warm-catalogues:{get_catalogue_version(sender)}'
+    ))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_user_recipe_ids(sender, instance, **kwargs):
+    invalidate_recipe_ids(sender, instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_shopping_list(sender, instance, **kwargs):
+    bump_cart_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        update_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    # Без общего кеша лента читается запросом через подписки. Счетчик
+    # подписчиков автора заменяет запрос к подпискам при каждом рецепте
+    if created and is_cache_shared() and instance.author.followers_count:
+        enqueue(
+            fan_out_recipe_job.job_name,
+            key=f'fan-out-recipe:{instance.pk}',
+            recipe_id=instance.pk,
+            author_id=instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    update_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        update_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    if instance.recipe_id not in skipped_recipe_ids.get():
+        update_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        update_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    update_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_user_timeline(sender, instance, **kwargs):
+    invalidate_timeline(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def update_recipe_rollups(sender, instance, **kwargs):
+    if instance.recipe_id in skipped_recipe_ids.get():
+        return
+    update_rollups(pk=instance.recipe_id)
+    invalidate_shopping_lists((instance.recipe_id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientAttribute)
+def update_ingredient_rollups(sender, instance, **kwargs):
+    bump_catalogue_version(IngredientAttribute)
+    enqueue(
+        update_rollups_job.job_name,
+        ingredient_ids=[instance.ingredient_id]
+    )
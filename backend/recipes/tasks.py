@@ -0,0 +1,48 @@
+from django.urls import reverse
+
+from jobs.queue import job
+from recipes.counters import recount_counters
+from recipes.feed import push_to_timelines
+from recipes.images import process_recipe_image  # noqa: F401
+from recipes.models import Ingredient, Tag
+from recipes.rollups import update_all_rollups, update_rollups
+from foodgram.cache import is_cache_shared
+
+
+@job('recipes.recount_counters')
+def recount_counters_job():
+    recount_counters()
+
+
+@job('recipes.update_rollups')
+def update_rollups_job(ingredient_ids=None):
+    '''Пересчет калорийности и стоимости рецептов с этими ингредиентами'''
+    if ingredient_ids is None:
+        update_all_rollups()
+        return
+    update_rollups(recipe_ingredients__ingredient_id__in=ingredient_ids)
+
+
+@job('recipes.fan_out_recipe')
+def fan_out_recipe_job(recipe_id, author_id):
+    '''Добавление нового рецепта в ленты подписчиков автора'''
+    push_to_timelines(recipe_id, author_id)
+
+
+@job('recipes.warm_catalogues')
+def warm_catalogues():
+    '''Заполнение общего кеша справочников после их изменения'''
+    from api.filters import get_tag_ids
+    from api.serializers import IngredientSerializer, TagSerializer
+    from recipes.cache import get_catalogue
+
+    if not is_cache_shared():
+        return
+    get_tag_ids()
+    for model, serializer, url_name in (
+        (Tag, TagSerializer, 'recipes:tags-list'),
+        (Ingredient, IngredientSerializer, 'recipes:ingredients-list'),
+    ):
+        get_catalogue(model, reverse(url_name), lambda: list(
+            serializer(model.objects.all(), many=True).data
+        ))
@@ -1,7 +1,6 @@
 from django.contrib import admin
 
 from users.models import User, Subscription
-from recipes.models import Recipe
 
 
 @admin.register(User)
@@ -25,12 +24,6 @@ class UsersAdmin(admin.ModelAdmin):
     list_editable = ('username', 'first_name', 'last_name')
     empty_value_display = '-пусто-'
 
-    def recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
-    def followers_count(self, obj):
-        return Subscription.objects.filter(user=obj).count()
-
 
 @admin.register(Subscription)
 class SubscriptionsAdmin(admin.ModelAdmin):
@@ -1,17 +1,30 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 
+from foodgram.models import ComputedFieldsMixin
 from foodgram.settings import LENGTH_254
 
 
-class User(AbstractUser):
+class User(ComputedFieldsMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         db_index=True,
         max_length=LENGTH_254,
         verbose_name='email'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    computed_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('username',)
@@ -56,5 +69,7 @@ class Subscription(models.Model):
         return super().clean()
 
     def save(self, *args, **kwargs):
+        """Сохранение и обновление счетчиков в одной транзакции"""
         self.full_clean()
-        return super().save(*args, **kwargs)
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
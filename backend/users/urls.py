@@ -1,14 +1,29 @@
 from django.urls import path, include
 from djoser.views import TokenCreateView, TokenDestroyView
 
-from api.views import SubscribtionsView, SubscribtionsCreateDeleteView
+from api.views import (
+    SubscribtionsView, SubscribtionsCreateDeleteView, SubscribtionsBulkView
+)
 
 
 app_name = 'users'
 
 urlpatterns = [
-    path('users/<int:pk>/subscribe/', SubscribtionsCreateDeleteView.as_view()),
-    path('users/subscriptions/', SubscribtionsView.as_view()),
+    path(
+        'users/<int:pk>/subscribe/',
+        SubscribtionsCreateDeleteView.as_view(),
+        name='subscribe'
+    ),
+    path(
+        'users/subscribe/',
+        SubscribtionsBulkView.as_view(),
+        name='subscribe-bulk'
+    ),
+    path(
+        'users/subscriptions/',
+        SubscribtionsView.as_view(),
+        name='subscriptions'
+    ),
     path('auth/token/login/', TokenCreateView.as_view()),
     path('auth/token/logout/', TokenDestroyView.as_view()),
     path('', include('djoser.urls')),